@@ -11,19 +11,65 @@ Notas:
 
 from __future__ import annotations
 import streamlit as st
-from hash_utils import hash_text, hash_file_chunked, generate_salt, apply_salt, apply_pepper, hmac_text, compare_hashes, DEFAULT_ALGOS
+from hash_utils import hash_text, hash_file_chunked, hash_file_multi, generate_salt, hash_bytes_stream, prehash, hash_batch, SEPARATOR, hmac_text, hmac_file, pbkdf2_text, PBKDF2_ITERATIONS, compare_hashes, compare_digests, DEFAULT_ALGOS, DEFAULT_CHUNK_SIZE, DEFAULT_FILE_ALGO
 import io
 import csv
-import base64
 
 # ----- Configuración -----
 st.set_page_config(page_title="Streamlit Hash Demo", layout="centered")
 MAX_FILE_MB = 10
 MAX_FILE_BYTES = MAX_FILE_MB * 1024 * 1024
 
+@st.cache_data(show_spinner=False)
+def hash_uploaded_file(file_id: str, algorithm: str, _file_obj) -> str:
+    """
+    Hash del fichero subido, cacheado por (file_id, algoritmo) entre reruns.
+    _file_obj no forma parte de la clave: el UploadedFile se hashea
+    directamente, sin copiar su contenido a otro buffer.
+    Sin callback de progreso: Streamlit repetiría en cada acierto de caché las
+    llamadas a elementos creados fuera de la función (CacheReplayClosureError).
+    """
+    _file_obj.seek(0)
+    return hash_file_chunked(_file_obj, algorithm=algorithm, chunk_size=DEFAULT_CHUNK_SIZE)
+
+@st.cache_data(show_spinner=False)
+def hash_uploaded_file_multi(file_id: str, algorithms: tuple, _file_obj) -> dict:
+    """
+    Varios hashes del fichero subido en una sola lectura, cacheados por (file_id, algoritmos).
+    """
+    _file_obj.seek(0)
+    return hash_file_multi(_file_obj, algorithms)
+
+def _clear_secrets_cache(*_args, **_kwargs) -> None:
+    """
+    Receptor de st.secrets.file_change_listener: vacía la caché al cambiar secrets.toml.
+    """
+    st.secrets.file_change_listener.disconnect(_clear_secrets_cache)
+    _load_secrets.clear()
+
+@st.cache_resource
+def _load_secrets():
+    """
+    Lee PEPPER y HMAC_KEY de st.secrets una sola vez mientras secrets.toml no cambie.
+    """
+    # al editar/rotar secrets.toml Streamlit emite la señal y se vuelve a leer
+    st.secrets.file_change_listener.connect(_clear_secrets_cache, weak=False)
+    return st.secrets.get("PEPPER"), st.secrets.get("HMAC_KEY")
+
+def _secrets():
+    """
+    Resuelve PEPPER y HMAC_KEY. Sin secrets.toml no se cachea nada (ni se muestra
+    error), para que un fichero añadido después se lea en el siguiente rerun.
+    """
+    if not st.secrets.load_if_toml_exists():
+        return None, None
+    return _load_secrets()
+
+pepper, hmac_key = _secrets()
+
 # ----- UI -----
 st.title("🔐 Streamlit Hash Demo")
-st.markdown("App educativa: hashing (SHA/BLAKE2), salt, pepper y HMAC. **No** almacenes secrets en el repo.")
+st.markdown("App educativa: hashing (SHA/BLAKE2/BLAKE3), salt, pepper y HMAC. **No** almacenes secrets en el repo.")
 
 tabs = st.tabs(["Hash Texto", "Hash Archivo", "Comparar", "Salting/Pepper", "HMAC", "Descargar / CSV", "Ayuda"])
 
@@ -39,34 +85,36 @@ with tabs[0]:
 with tabs[1]:
     st.header("Hash de archivo")
     f = st.file_uploader("Sube un fichero (máx 10 MB)", type=None)
-    algo_file = st.selectbox("Algoritmo (archivo)", DEFAULT_ALGOS, index=0, key="algo_file")
+    algo_file = st.selectbox("Algoritmo (archivo)", DEFAULT_ALGOS, index=DEFAULT_ALGOS.index(DEFAULT_FILE_ALGO), key="algo_file")
     if f is not None:
         if f.size > MAX_FILE_BYTES:
             st.error(f"Fichero demasiado grande: {f.size} bytes > {MAX_FILE_BYTES} bytes")
         else:
             progress = st.progress(0)
             status = st.empty()
-            # leer en chunks usando buffer
-            buffer = io.BytesIO(f.read())
-            buffer.seek(0)
-            def progress_cb(total_bytes):
-                # actualizamos barra en base a bytes leídos; como no conocemos total fiable, usamos heurística
-                try:
-                    pct = min(1.0, total_bytes / f.size)
-                except Exception:
-                    pct = 0.0
-                progress.progress(int(pct*100))
-                status.text(f"{total_bytes} bytes leídos")
-            digest = hash_file_chunked(buffer, algorithm=algo_file, chunk_size=8192, progress_callback=progress_cb)
+            digest = hash_uploaded_file(f.file_id, algo_file, f)
+            # el progreso se actualiza fuera de la función cacheada (el UploadedFile
+            # se hashea de una vez, así que solo hay un estado final)
+            progress.progress(100)
+            status.text(f"{f.size} bytes leídos")
             st.code(digest)
             st.success(f"Algoritmo: {algo_file} — tamaño: {f.size} bytes")
+            algos_multi = st.multiselect("Calcular también con (una sola lectura)", DEFAULT_ALGOS, key="algos_multi")
+            if algos_multi:
+                digests = hash_uploaded_file_multi(f.file_id, tuple(algos_multi), f)
+                st.table([(a, d) for a, d in digests.items()])
 
 with tabs[2]:
     st.header("Comparar hashes")
     h1 = st.text_input("Hash 1")
     h2 = st.text_input("Hash 2")
     if st.button("Comparar"):
-        ok = compare_hashes(h1.strip(), h2.strip())
+        a, b = h1.strip(), h2.strip()
+        try:
+            # hex pegado: comparar los digests en bytes
+            ok = compare_digests(bytes.fromhex(a), bytes.fromhex(b))
+        except ValueError:
+            ok = compare_hashes(a, b)
         if ok:
             st.success("Los hashes coinciden (compare_digest)")
         else:
@@ -84,7 +132,6 @@ with tabs[3]:
     with col2:
         salt_input = st.text_input("Salt (base64) — pegar aquí para aplicar")
         algo_sp = st.selectbox("Algoritmo (salt/pepper)", DEFAULT_ALGOS, index=0, key="algo_sp")
-        pepper = st.secrets.get("PEPPER") if hasattr(st, "secrets") else None
         if pepper:
             st.write("Pepper configurado en st.secrets (usado si lo aplicas).")
         else:
@@ -93,16 +140,34 @@ with tabs[3]:
             if not salt_input:
                 st.error("Provee un salt (o genera uno).")
             else:
-                combined = apply_salt(txt_s, salt_input)
-                digest_sp = hash_text(combined, algorithm=algo_sp)
+                # salt$texto hasheado por partes, sin concatenar
+                digest_sp = hash_bytes_stream([salt_input.encode(), SEPARATOR, txt_s.encode()], algorithm=algo_sp)
                 st.code(digest_sp)
                 st.write("Nota: el salt se debe almacenar junto al digest para verificación.")
+        if st.button("Derivar con PBKDF2 (salt)"):
+            if not salt_input:
+                st.error("Provee un salt (o genera uno).")
+            else:
+                try:
+                    derived = pbkdf2_text(txt_s, salt_input, algorithm=algo_sp)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.code(derived)
+                    st.write(f"PBKDF2-HMAC-{algo_sp} con {PBKDF2_ITERATIONS} iteraciones: recomendado para contraseñas.")
         if st.button("Hash con pepper (usando PEPPER en st.secrets)"):
             if not pepper:
                 st.error("PEPPER no configurado.")
             else:
-                combined_p = apply_pepper(txt_s, pepper)
-                digest_p = hash_text(combined_p, algorithm=algo_sp)
+                # hasher con pepper$ ya consumido, reutilizado entre clics vía .copy()
+                # clave (algoritmo, pepper): un PEPPER rotado invalida el hasher guardado
+                pepper_key = (algo_sp, pepper)
+                pepper_h = st.session_state.get("pepper_h")
+                if pepper_h is None or pepper_h[0] != pepper_key:
+                    pepper_h = st.session_state["pepper_h"] = (pepper_key, prehash(pepper.encode() + SEPARATOR, algo_sp))
+                h = pepper_h[1].copy()
+                h.update(txt_s.encode())
+                digest_p = h.hexdigest()
                 st.code(digest_p)
                 st.write("Pepper es secreto y no debe almacenarse en texto claro; usar st.secrets.")
 
@@ -110,16 +175,22 @@ with tabs[4]:
     st.header("HMAC")
     txt_h = st.text_input("Texto para HMAC", value="mensaje")
     algo_h = st.selectbox("Algoritmo HMAC", DEFAULT_ALGOS, index=0, key="algo_h")
-    hmac_key = st.secrets.get("HMAC_KEY") if hasattr(st, "secrets") else None
     if hmac_key:
         st.write("HMAC_KEY configurada en st.secrets.")
     else:
         st.warning("HMAC_KEY no configurada en st.secrets — añadir en Streamlit Cloud.")
+    f_h = st.file_uploader("O adjunta un fichero (máx 10 MB) para su HMAC", type=None, key="file_hmac")
     if st.button("Calcular HMAC"):
         if not hmac_key:
             st.error("HMAC_KEY no configurada.")
+        elif f_h is not None and f_h.size > MAX_FILE_BYTES:
+            st.error(f"Fichero demasiado grande: {f_h.size} bytes > {MAX_FILE_BYTES} bytes")
         else:
-            mac = hmac_text(txt_h, key=hmac_key, algorithm=algo_h)
+            if f_h is not None:
+                f_h.seek(0)
+                mac = hmac_file(f_h, key=hmac_key, algorithm=algo_h)
+            else:
+                mac = hmac_text(txt_h, key=hmac_key, algorithm=algo_h)
             st.code(mac)
             st.write("HMAC provee **autenticidad** y detección de modificación si la clave es secreta.")
 
@@ -135,18 +206,24 @@ with tabs[5]:
             st.success("Añadido (temporal, solo dura en esta interacción).")
         else:
             st.error("Proveer etiqueta y hash.")
+    batch_txt = st.text_area("Textos a hashear en lote (uno por línea)", key="batch_txt")
+    algo_batch = st.selectbox("Algoritmo (lote)", DEFAULT_ALGOS, index=0, key="algo_batch")
+    if st.button("Hashear lote"):
+        lines = [line for line in batch_txt.splitlines() if line]
+        if lines:
+            results.extend(zip(lines, hash_batch([line.encode() for line in lines], algorithm=algo_batch)))
+            st.success(f"{len(lines)} entradas hasheadas con {algo_batch}.")
+        else:
+            st.error("Provee al menos una línea de texto.")
     if results:
         st.write("Resultados actuales:")
         st.table(results)
-        # preparar CSV
-        csv_bytes = io.StringIO()
-        writer = csv.writer(csv_bytes)
+        # preparar CSV (st.download_button sirve los bytes tal cual, sin base64)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
         writer.writerow(["label", "hash"])
-        for r in results:
-            writer.writerow(r)
-        b64 = base64.b64encode(csv_bytes.getvalue().encode()).decode()
-        href = f'<a href="data:file/csv;base64,{b64}" download="hash-results.csv">Descargar CSV</a>'
-        st.markdown(href, unsafe_allow_html=True)
+        writer.writerows(results)
+        st.download_button("Descargar CSV", buf.getvalue().encode(), "hash-results.csv", "text/csv")
     else:
         st.info("No hay resultados en esta sesión interactiva. Añade entradas y descarga.")
 
@@ -159,6 +236,6 @@ with tabs[6]:
 - **Pepper**: secreto adicional; almacenarlo en st.secrets o KMS; no subir al repo.
 - **HMAC**: autentica origen/integidad si clave secreta es compartida.
 - **SHA-1**: vulnerable a colisiones — no usar para seguridad crítica.
-- Para contraseñas, usar PBKDF2/Argon2 con sal y múltiples iteraciones (señalado como mejora).
+- Para contraseñas, usar PBKDF2/Argon2 con sal y múltiples iteraciones (PBKDF2 disponible en la pestaña Salting/Pepper; Argon2 señalado como mejora).
 """
     )
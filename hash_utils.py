@@ -6,12 +6,23 @@ Diseñado para ser importado por app.py.
 
 Funcionalidades:
 - hash_text: hash de texto con varios algoritmos soportados.
+- hash_text_raw: como hash_text, pero devuelve el digest en bytes.
 - hash_file_chunked: hash incremental de archivos (lee en chunks).
+- hash_file_multi: varios algoritmos sobre un fichero en una sola lectura.
+- digest_size: tamaño en bytes del digest de un algoritmo.
 - generate_salt: generar salt seguro (base64).
-- apply_salt: combinar texto+salt (básico).
-- apply_pepper: combinar texto+pepper (pepper no se guarda en repo).
+- generate_salt_bytes: generar salt seguro en bytes (sin base64).
+- apply_salt: combinar texto+salt en bytes (básico).
+- apply_pepper: combinar texto+pepper en bytes (pepper no se guarda en repo).
+- hash_bytes_stream: hash de varias partes en bytes sin concatenarlas.
+- prehash: objeto hash con un prefijo ya consumido (reutilizable con .copy()).
+- hash_batch: hash de muchas entradas en bytes (lote para CSV).
 - hmac_text: calcular HMAC usando hmac library.
+- hmac_file: HMAC de un fichero en streaming (memoria O(chunk_size)).
+- make_hmac: objeto HMAC pre-inicializado con la clave (reutilizable con .copy()).
+- pbkdf2_text: derivación PBKDF2-HMAC (para contraseñas).
 - compare_hashes: comparar de forma segura (hmac.compare_digest).
+- compare_digests: igual que compare_hashes pero sobre digests en bytes.
 """
 
 from __future__ import annotations
@@ -19,103 +30,479 @@ import hashlib
 import hmac
 import os
 import base64
-from typing import Tuple, Optional, Iterable, Callable
+import contextlib
+import io
+import logging
+import mmap
+import platform
+import secrets
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Iterable, Iterator, Callable, Union
+
+try:
+    import streamlit as st
+    # memoiza resultados entre reruns de Streamlit (clave = hash de los argumentos)
+    _cache_data = st.cache_data(show_spinner=False)
+except ImportError:  # uso fuera de Streamlit (tests, scripts)
+    def _cache_data(func):
+        return func
+
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:  # dependencia opcional
+    _blake3 = None
+
+logger = logging.getLogger(__name__)
 
 # Algoritmos soportados por defecto
 DEFAULT_ALGOS = ['sha256', 'sha1', 'sha512', 'blake2b']
+if _blake3 is not None:
+    DEFAULT_ALGOS.append('blake3')
+# Algoritmo por defecto para ficheros: BLAKE3 (SIMD + árbol interno) si está instalado
+DEFAULT_FILE_ALGO = 'blake3' if _blake3 is not None else 'sha256'
+
+# Tamaño de chunk por defecto (1 MiB): amortiza el coste del intérprete por llamada a update()
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Cada cuántos chunks se notifica el progreso (evita que la UI domine el tiempo)
+PROGRESS_EVERY_CHUNKS = 8
+
+def _build_ctor(name: str) -> Callable[..., "hashlib._Hash"]:
+    """
+    Constructor de hashlib para un nombre ya validado; prefiere el constructor
+    con nombre (hashlib.sha256, ...) que evita el despacho de hashlib.new.
+    Como los constructores de hashlib, acepta datos iniciales opcionales.
+    """
+    named = getattr(hashlib, name, None)
+    if callable(named):
+        return named
+    return lambda data=b'': hashlib.new(name, data)
+
+# Constructores validados una sola vez al importar el módulo
+_HASHER_CTORS = {a: _build_ctor(a) for a in DEFAULT_ALGOS if a in hashlib.algorithms_available}
+if _blake3 is not None:
+    _HASHER_CTORS['blake3'] = _blake3
+# Tamaño del digest (bytes) por algoritmo
+_DIGEST_SIZES = {a: ctor().digest_size for a, ctor in _HASHER_CTORS.items()}
 
 def _get_hasher(name: str):
     """
     Devuelve un constructor de objeto hash de hashlib según el nombre.
     Raise ValueError si no existe.
     """
-    name = name.lower()
-    if name not in hashlib.algorithms_available and name not in hashlib.algorithms_guaranteed:
-        # intentar mapear blake2b
-        if name == 'blake2b' and 'blake2b' in hashlib.algorithms_available:
-            return lambda: hashlib.blake2b()
+    try:
+        return _HASHER_CTORS[name]
+    except KeyError:
+        pass
+    key = name.lower()
+    if key in _HASHER_CTORS:
+        return _HASHER_CTORS[key]
+    if key not in hashlib.algorithms_available:
         raise ValueError(f"Algoritmo {name} no soportado en este entorno.")
-    def ctor():
-        return hashlib.new(name)
+    # algoritmo fuera de DEFAULT_ALGOS: se valida y se cachea la primera vez
+    ctor = _HASHER_CTORS[key] = _build_ctor(key)
+    _DIGEST_SIZES[key] = ctor().digest_size
     return ctor
 
+def digest_size(algorithm: str) -> int:
+    """
+    Tamaño en bytes del digest del algoritmo (hex = 2x).
+    """
+    _get_hasher(algorithm)
+    return _DIGEST_SIZES[algorithm.lower()]
+
+@_cache_data
 def hash_text(text: str, algorithm: str = 'sha256', encoding: str='utf-8') -> str:
     """
     Calcula el hash del texto dado y devuelve hex digest.
     - text: cadena a hashear.
-    - algorithm: 'sha256' por defecto (soporta: sha1, sha256, sha512, blake2b).
+    - algorithm: 'sha256' por defecto (soporta: sha1, sha256, sha512, blake2b y blake3 si está instalado).
     """
     ctor = _get_hasher(algorithm)
     h = ctor()
     h.update(text.encode(encoding))
     return h.hexdigest()
 
-def hash_file_chunked(file_obj, algorithm: str='sha256', chunk_size: int=8192, progress_callback: Optional[Callable[[int], None]]=None) -> str:
+@_cache_data
+def hash_text_raw(text: str, algorithm: str = 'sha256', encoding: str='utf-8') -> bytes:
+    """
+    Como hash_text pero devuelve el digest en bytes (sin formatear a hex).
+    Útil para comparar con compare_digests.
+    """
+    ctor = _get_hasher(algorithm)
+    h = ctor()
+    h.update(text.encode(encoding))
+    return h.digest()
+
+# Umbral (MB/s) por debajo del cual SHA-256 no parece usar las extensiones SHA-NI
+SHA_NI_MIN_MB_S = 500.0
+
+def _cpu_has_sha_ni() -> bool:
+    """
+    True si la CPU (x86, Linux) anuncia el flag sha_ni en /proc/cpuinfo.
+    """
+    if platform.machine().lower() not in ('x86_64', 'amd64', 'i386', 'i686'):
+        return False
+    try:
+        with open('/proc/cpuinfo') as fh:
+            for line in fh:
+                if line.startswith('flags'):
+                    return 'sha_ni' in line.split()
+    except OSError:
+        pass
+    return False
+
+def check_sha_acceleration(min_mb_s: float=SHA_NI_MIN_MB_S) -> Optional[float]:
+    """
+    Mide el throughput de SHA-256 (1 MiB) si la CPU soporta SHA-NI.
+    Si queda por debajo de min_mb_s, el OpenSSL enlazado probablemente no usa
+    SHA-NI y se emite un warning. Devuelve MB/s medidos o None si no aplica.
+    """
+    if not _cpu_has_sha_ni():
+        return None
+    data = bytes(1 << 20)
+    best = float('inf')
+    for _ in range(3):
+        t0 = time.perf_counter()
+        hashlib.sha256(data).digest()
+        best = min(best, time.perf_counter() - t0)
+    mb_s = len(data) / (1 << 20) / max(best, 1e-9)
+    if mb_s < min_mb_s:
+        try:
+            import ssl
+            openssl_version = ssl.OPENSSL_VERSION
+        except ImportError:
+            openssl_version = 'desconocido'
+        logger.warning(
+            "SHA-256 a %.0f MB/s en una CPU con SHA-NI: el OpenSSL de este Python "
+            "(%s) probablemente no usa las extensiones SHA. Usar un Python enlazado "
+            "con OpenSSL >= 3.0.", mb_s, openssl_version)
+    return mb_s
+
+def _notify_progress(progress_callback: Optional[Callable[[int], None]], total: int) -> None:
+    """
+    Llama al callback de progreso ignorando errores de la UI.
+    """
+    if progress_callback:
+        try:
+            progress_callback(total)
+        except Exception:
+            pass
+
+class _ProgressReader:
+    """
+    Proxy mínimo sobre un lector binario que cuenta bytes en readinto()
+    y notifica el progreso; permite usar hashlib.file_digest con barra de progreso.
+    """
+    def __init__(self, raw, progress_callback: Callable[[int], None]):
+        self._raw = raw
+        self._progress_callback = progress_callback
+        self.total = 0
+        self.reported = 0
+        self._n_reads = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        n = self._raw.readinto(buf)
+        if n:
+            self.total += n
+            self._n_reads += 1
+            if self._n_reads % PROGRESS_EVERY_CHUNKS == 0:
+                _notify_progress(self._progress_callback, self.total)
+                self.reported = self.total
+        return n
+
+def _supports_file_digest(file_obj) -> bool:
+    """
+    True si hashlib.file_digest puede consumir file_obj (Python 3.11+, lector binario).
+    """
+    if sys.version_info < (3, 11) or isinstance(file_obj, io.TextIOBase):
+        return False
+    if not hasattr(file_obj, 'readinto'):
+        return False
+    try:
+        return bool(file_obj.readable())
+    except (AttributeError, ValueError):
+        return False
+
+@contextlib.contextmanager
+def _whole_buffer(file_obj) -> Iterator[Optional[memoryview]]:
+    """
+    Context manager que expone el contenido restante de file_obj como un único
+    memoryview: getvalue() para BytesIO/UploadedFile (bytes compartidos, sin copia
+    mientras no se escriba en el objeto) y mmap para ficheros regulares en disco.
+    Produce None si no aplica (texto, pipes, pseudo-ficheros de /proc con tamaño 0).
+    Al salir, file_obj queda al final, igual que tras el bucle de lectura.
+    """
+    if isinstance(file_obj, io.TextIOBase):
+        yield None
+        return
+    if hasattr(file_obj, 'getvalue'):
+        start = file_obj.tell()
+        with memoryview(file_obj.getvalue()) as mv, mv[start:] as view:
+            yield view
+        file_obj.seek(0, io.SEEK_END)
+        return
+    try:
+        fd = file_obj.fileno()
+    except (AttributeError, OSError, ValueError):
+        yield None
+        return
+    st_info = os.fstat(fd)
+    if not stat.S_ISREG(st_info.st_mode) or st_info.st_size == 0:
+        # pipes/sockets o pseudo-ficheros (/proc, /sys): tamaño desconocido, no se mapean
+        yield None
+        return
+    start = file_obj.tell()
+    if st_info.st_size <= start:
+        yield memoryview(b'')
+        return
+    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as mv, mv[start:] as view:
+            yield view
+    file_obj.seek(0, io.SEEK_END)
+
+def _update_from_buffer(h, file_obj) -> Optional[int]:
+    """
+    Alimenta h con todo el contenido restante de file_obj en una sola llamada a
+    update() (ver _whole_buffer). Devuelve los bytes hasheados o None si no aplica.
+    """
+    with _whole_buffer(file_obj) as view:
+        if view is None:
+            return None
+        h.update(view)
+        return len(view)
+
+def _sniff_reader(file_obj, chunk_size: int) -> Tuple[bytes, Callable[[int], bytes]]:
+    """
+    Lee el primer chunk y decide una sola vez si file_obj devuelve str o bytes.
+    Devuelve (primer chunk en bytes, función read(n) -> bytes) para que el
+    bucle de lectura no compruebe el tipo en cada iteración.
+    """
+    chunk = file_obj.read(chunk_size)
+    if not isinstance(chunk, str):
+        return chunk, file_obj.read
+    def read_encoded(n: int, _read=file_obj.read) -> bytes:
+        return _read(n).encode('utf-8')
+    return chunk.encode('utf-8'), read_encoded
+
+def hash_file_chunked(file_obj, algorithm: str='sha256', chunk_size: int=DEFAULT_CHUNK_SIZE, progress_callback: Optional[Callable[[int], None]]=None) -> str:
     """
     Calcula hash de un fichero leyendo en chunks.
     - file_obj: objeto file-like (con read()) ya posicionado al inicio.
+    - chunk_size: bytes por lectura (1 MiB por defecto; solo en el bucle manual).
     - progress_callback: función opcional que recibe bytes leídos para actualizar UI.
+      Se llama cada PROGRESS_EVERY_CHUNKS chunks y una vez al final.
     Devuelve hex digest.
+    BytesIO/UploadedFile y ficheros en disco se hashean con un único update()
+    sobre un memoryview (getvalue/mmap); el progreso se notifica una vez al final.
+    En Python 3.11+ otros lectores binarios se delegan en hashlib.file_digest
+    (bucle de lectura en C); el bucle manual queda como fallback.
     """
     ctor = _get_hasher(algorithm)
     h = ctor()
+    size = _update_from_buffer(h, file_obj)
+    if size is not None:
+        _notify_progress(progress_callback, size)
+        return h.hexdigest()
+    if _supports_file_digest(file_obj):
+        if not progress_callback:
+            return hashlib.file_digest(file_obj, ctor).hexdigest()
+        reader = _ProgressReader(file_obj, progress_callback)
+        digest = hashlib.file_digest(reader, ctor).hexdigest()
+        if reader.total != reader.reported:
+            _notify_progress(progress_callback, reader.total)
+        return digest
+    chunk, read = _sniff_reader(file_obj, chunk_size)
     total = 0
-    while True:
-        chunk = file_obj.read(chunk_size)
-        if not chunk:
-            break
-        if isinstance(chunk, str):
-            chunk = chunk.encode('utf-8')
+    n_chunks = 0
+    reported = 0
+    while chunk:
         h.update(chunk)
         total += len(chunk)
-        if progress_callback:
-            try:
-                progress_callback(total)
-            except Exception:
-                pass
+        n_chunks += 1
+        if n_chunks % PROGRESS_EVERY_CHUNKS == 0:
+            _notify_progress(progress_callback, total)
+            reported = total
+        chunk = read(chunk_size)
+    if total != reported:
+        _notify_progress(progress_callback, total)
     return h.hexdigest()
 
+def hash_file_multi(file_obj, algorithms: Iterable[str], chunk_size: int=DEFAULT_CHUNK_SIZE) -> dict[str, str]:
+    """
+    Calcula varios hashes del mismo fichero leyéndolo una sola vez.
+    Cada chunk (o el buffer completo si es BytesIO/UploadedFile o un fichero en
+    disco, ver _whole_buffer) se pasa a todos los hashers en paralelo con hilos:
+    hashlib libera el GIL en update() grandes, así el tiempo total se acerca al
+    del algoritmo más lento y no a la suma.
+    Devuelve {algoritmo: hex digest}.
+    """
+    hashers = {a: _get_hasher(a)() for a in algorithms}
+    if not hashers:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(hashers)) as pool:
+        def update_all(data) -> None:
+            # list() espera a que terminen todos los update() antes de seguir
+            list(pool.map(lambda h: h.update(data), hashers.values()))
+
+        with _whole_buffer(file_obj) as view:
+            if view is not None:
+                update_all(view)
+        if view is None:
+            chunk, read = _sniff_reader(file_obj, chunk_size)
+            while chunk:
+                update_all(chunk)
+                chunk = read(chunk_size)
+    return {a: h.hexdigest() for a, h in hashers.items()}
+
+def generate_salt_bytes(n_bytes: int=16) -> bytes:
+    """
+    Genera un salt seguro en bytes (listo para apply_salt / hash_bytes_stream).
+    - n_bytes: tamaño en bytes (16 por defecto).
+    """
+    return secrets.token_bytes(n_bytes)
+
 def generate_salt(n_bytes: int=16) -> str:
     """
-    Genera un salt seguro y devuelve base64 (fácil de almacenar).
+    Genera un salt seguro y devuelve base64 (fácil de almacenar y mostrar en UI).
     - n_bytes: tamaño en bytes (16 por defecto).
     """
-    return base64.b64encode(os.urandom(n_bytes)).decode('utf-8')
+    return base64.b64encode(generate_salt_bytes(n_bytes)).decode('utf-8')
+
+def prehash(prefix: bytes, algorithm: str='sha256') -> "hashlib._Hash":
+    """
+    Devuelve un objeto hash que ya ha consumido prefix (p.ej. pepper + SEPARATOR).
+    Hacer .copy() + update(texto) por cada entrada evita re-hashear el prefijo.
+    """
+    h = _get_hasher(algorithm)()
+    h.update(prefix)
+    return h
 
-def apply_salt(text: str, salt_b64: str) -> str:
+def hash_batch(texts: Iterable[bytes], algorithm: str='sha256') -> list[str]:
     """
-    Combina texto y salt (salt público) en una forma estable.
+    Hash de muchas entradas (p.ej. filas de un CSV) con el constructor resuelto
+    una sola vez; el bucle por fila queda en una list comprehension.
+    Devuelve una lista de hex digests en el mismo orden.
+    """
+    ctor = _get_hasher(algorithm)
+    return [ctor(t).hexdigest() for t in texts]
+
+# Separador entre salt/pepper y texto
+SEPARATOR = b"$"
+
+def apply_salt(text: Union[bytes, str], salt: Union[bytes, str], encoding: str='utf-8') -> bytes:
+    """
+    Combina texto y salt (salt público) en una forma estable: salt$texto.
+    Acepta bytes o str (se codifican con encoding). Devuelve bytes.
     Notar: el salt se almacena junto al hash en la práctica.
+    Para hashear sin concatenar: hash_bytes_stream([salt, SEPARATOR, text]).
     """
-    return f"{salt_b64}${text}"
+    if isinstance(text, str):
+        text = text.encode(encoding)
+    if isinstance(salt, str):
+        salt = salt.encode(encoding)
+    return salt + SEPARATOR + text
 
-def apply_pepper(text: str, pepper: str) -> str:
+def apply_pepper(text: Union[bytes, str], pepper: Union[bytes, str], encoding: str='utf-8') -> bytes:
     """
-    Aplica pepper (secreto compartido) al texto antes de hashear.
+    Aplica pepper (secreto compartido) al texto antes de hashear: pepper$texto.
+    Acepta bytes o str (se codifican con encoding). Devuelve bytes.
     Pepper debe guardarse en st.secrets o similar y NO en el repo.
     """
-    return f"{pepper}${text}"
+    if isinstance(text, str):
+        text = text.encode(encoding)
+    if isinstance(pepper, str):
+        pepper = pepper.encode(encoding)
+    return pepper + SEPARATOR + text
 
+def hash_bytes_stream(parts: Iterable[bytes], algorithm: str='sha256') -> str:
+    """
+    Hash de la concatenación de parts sin materializarla (un update() por parte).
+    Devuelve hex digest.
+    """
+    h = _get_hasher(algorithm)()
+    for p in parts:
+        h.update(p)
+    return h.hexdigest()
+
+def _hmac_digestmod(algorithm: str):
+    """
+    digestmod para hmac.new: el nombre si hashlib lo conoce (ruta rápida de OpenSSL),
+    o el constructor para algoritmos externos como blake3.
+    """
+    algo = algorithm.lower()
+    ctor = _get_hasher(algo)
+    return algo if algo in hashlib.algorithms_available else ctor
+
+@_cache_data
 def hmac_text(text: str, key: str, algorithm: str='sha256', encoding: str='utf-8') -> str:
     """
     Calcula HMAC del texto usando la clave proporcionada.
     - key: string secreto (no en repo).
     - algorithm: algoritmo de hashlib compatible para HMAC.
     """
-    algo = algorithm.lower()
-    if algo not in hashlib.algorithms_available and algo not in hashlib.algorithms_guaranteed:
-        if algo == 'blake2b' and 'blake2b' in hashlib.algorithms_available:
-            digestmod = hashlib.blake2b
-        else:
-            digestmod = None
-    else:
-        digestmod = lambda d=b'': hashlib.new(algo, d)
-    # hmac.new acepta callable for digestmod in Python 3.11+, but to be safe we use name
-    h = hmac.new(key.encode(encoding), msg=text.encode(encoding), digestmod=hashlib.new(algo))
+    return hmac.new(key.encode(encoding), msg=text.encode(encoding), digestmod=_hmac_digestmod(algorithm)).hexdigest()
+
+def make_hmac(key: Union[str, bytes], algorithm: str='sha256', encoding: str='utf-8') -> hmac.HMAC:
+    """
+    Devuelve un objeto HMAC ya inicializado con la clave.
+    Para muchos mensajes con la misma clave: hacer .copy() y luego update(msg)
+    evita repetir la derivación de la clave en cada llamada.
+    """
+    if isinstance(key, str):
+        key = key.encode(encoding)
+    return hmac.new(key, digestmod=_hmac_digestmod(algorithm))
+
+def hmac_file(file_obj, key: Union[str, bytes], algorithm: str='sha256', chunk_size: int=DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Calcula HMAC de un fichero sin cargar el mensaje completo en memoria.
+    - file_obj: objeto file-like (con read()) ya posicionado al inicio.
+    BytesIO/UploadedFile y ficheros en disco se pasan sin copias (getvalue/mmap,
+    ver _whole_buffer); el resto se lee en chunks de chunk_size (los lectores de
+    texto se codifican en UTF-8, como en hash_file_chunked). Devuelve hex digest.
+    """
+    h = make_hmac(key, algorithm)
+    if _update_from_buffer(h, file_obj) is None:
+        chunk, read = _sniff_reader(file_obj, chunk_size)
+        while chunk:
+            h.update(chunk)
+            chunk = read(chunk_size)
     return h.hexdigest()
 
+# Iteraciones PBKDF2 por defecto (recomendación OWASP para PBKDF2-HMAC-SHA256)
+PBKDF2_ITERATIONS = 600_000
+
+def pbkdf2_text(text: Union[str, bytes], salt: Union[str, bytes], iterations: int=PBKDF2_ITERATIONS, algorithm: str='sha256', encoding: str='utf-8') -> str:
+    """
+    Deriva una clave con PBKDF2-HMAC (hashlib.pbkdf2_hmac) y devuelve hex.
+    El bucle de iteraciones corre entero en C/OpenSSL con el HMAC ya inicializado.
+    Solo algoritmos de hashlib (no blake3).
+    """
+    algo = algorithm.lower()
+    if algo not in hashlib.algorithms_available:
+        raise ValueError(f"Algoritmo {algorithm} no soportado para PBKDF2.")
+    if isinstance(text, str):
+        text = text.encode(encoding)
+    if isinstance(salt, str):
+        salt = salt.encode(encoding)
+    return hashlib.pbkdf2_hmac(algo, text, salt, iterations).hex()
+
 def compare_hashes(a: str, b: str) -> bool:
     """
     Comparación segura en tiempo constante (usando hmac.compare_digest).
     """
     return hmac.compare_digest(a, b)
+
+def compare_digests(a: bytes, b: bytes) -> bool:
+    """
+    Comparación en tiempo constante de digests en bytes (mitad de bytes que en hex).
+    """
+    return hmac.compare_digest(a, b)
+
+# Sondeo único al importar: avisa si SHA-256 no aprovecha SHA-NI
+check_sha_acceleration()
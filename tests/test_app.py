@@ -0,0 +1,112 @@
+"""
+Tests de la app Streamlit (app.py) ejecutada con LocalScriptRunner.
+Ejecutar desde la raíz del repo: python -m unittest discover -s tests
+"""
+
+from __future__ import annotations
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import streamlit as st
+from streamlit.proto.Common_pb2 import FileURLs
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.local_disk_cache_storage import LocalDiskCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+from streamlit.testing.local_script_runner import LocalScriptRunner
+
+from hash_utils import DEFAULT_FILE_ALGO, hash_file_chunked
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _uploaded_file(data: bytes=b"hola mundo") -> UploadedFile:
+    return UploadedFile(UploadedFileRec("test-file-id", "ejemplo.txt", "text/plain", data), FileURLs())
+
+
+class AppRerunTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # LocalScriptRunner necesita una instancia de Runtime (como en los tests de Streamlit)
+        runtime = mock.MagicMock(spec=Runtime)
+        runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+        runtime.cache_storage_manager = LocalDiskCacheStorageManager()
+        Runtime._instance = runtime
+
+    @classmethod
+    def tearDownClass(cls):
+        Runtime._instance = None
+
+    def setUp(self):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+    def test_file_hash_survives_cached_rerun(self):
+        """
+        Un rerun con el mismo fichero subido acierta la caché de hash_uploaded_file
+        y no debe romper la app (CacheReplayClosureError) ni cortar las demás pestañas.
+        """
+        with mock.patch.object(st, "file_uploader", return_value=_uploaded_file()):
+            trees = [LocalScriptRunner(APP_PATH).run(timeout=10) for _ in range(2)]
+        expected = hash_file_chunked(io.BytesIO(b"hola mundo"), algorithm=DEFAULT_FILE_ALGO)
+        for tree in trees:
+            self.assertIn(expected, [c.value for c in tree.get("code")])
+            self.assertEqual([e.value for e in tree.get("exception")], [])
+            self.assertIn("Ayuda y buenas prácticas", [h.value for h in tree.get("header")])
+
+
+class AppSecretsTest(unittest.TestCase):
+    """
+    PEPPER/HMAC_KEY se cachean con st.cache_resource, pero un secrets.toml
+    añadido o rotado debe verse sin reiniciar el proceso.
+    """
+    @classmethod
+    def setUpClass(cls):
+        AppRerunTest.setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        AppRerunTest.tearDownClass()
+
+    def setUp(self):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.secrets_path = os.path.join(self.tmpdir.name, "secrets.toml")
+        patcher = mock.patch.multiple(
+            st.secrets, _file_paths=[self.secrets_path], _secrets=None,
+            # sin watchers reales: el cambio de fichero se simula a mano
+            _file_watchers_installed=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write_secrets(self, content: str) -> None:
+        with open(self.secrets_path, "w") as fh:
+            fh.write(content)
+
+    def _run(self):
+        tree = LocalScriptRunner(APP_PATH).run(timeout=10)
+        self.assertEqual([e.value for e in tree.get("exception")], [])
+        self.assertEqual([e.value for e in tree.get("error")], [])
+        return [m.value for m in tree.get("markdown")]
+
+    def test_secrets_file_added_after_first_run(self):
+        self.assertNotIn("HMAC_KEY configurada en st.secrets.", self._run())
+        self._write_secrets('PEPPER = "p"\nHMAC_KEY = "k"\n')
+        self.assertIn("HMAC_KEY configurada en st.secrets.", self._run())
+
+    def test_secrets_file_rotated(self):
+        self._write_secrets('PEPPER = "p"\nHMAC_KEY = "k"\n')
+        self.assertIn("HMAC_KEY configurada en st.secrets.", self._run())
+        self._write_secrets('PEPPER = "p"\n')
+        st.secrets._on_secrets_file_changed(self.secrets_path)
+        self.assertNotIn("HMAC_KEY configurada en st.secrets.", self._run())
+
+
+if __name__ == "__main__":
+    unittest.main()